@@ -1,10 +1,15 @@
 import tkinter
 import tkinter.filedialog
 import tkinter.messagebox
+from tkinter import messagebox
 import customtkinter
+import codecs
 import os
 import fnmatch
+import re
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import queue
 import time
@@ -12,23 +17,49 @@ import json  # For saving/loading settings
 import platform  # For OS specific actions
 import subprocess  # For opening files/folders
 import sys  # For finding executable path
+import stat
+import tempfile  # For atomic settings writes
 import traceback  # For detailed error logging
+from typing import NamedTuple, Optional
 
-# Attempt to import gitignore_parser, provide message if missing
+# Attempt to import pathspec (for .gitignore matching), provide message if missing
 try:
-    import gitignore_parser
+    import pathspec
     GITIGNORE_AVAILABLE = True
 except ImportError:
     GITIGNORE_AVAILABLE = False
     # Non-blocking warning for GUI
-    # print("Warning: 'python-gitignore' package not found. .gitignore parsing will be disabled.")
-    # print("Install it using: pip install python-gitignore")
+    # print("Warning: 'pathspec' package not found. .gitignore parsing will be disabled.")
+    # print("Install it using: pip install pathspec")
+
+# orjson is optional; when present it reads/writes the settings file in C
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 # --- Constants and Default Configuration ---
 APP_VERSION = "2.0"
 CONFIG_FILENAME = "code_combiner_settings.json"
 DEFAULT_CHAR_THRESHOLD = 500000  # Warn if estimated output exceeds 500k chars
+# Directory listing is I/O-latency bound, so use more threads than cores
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Scan with bytes paths except on Windows, where the native API is wide-char
+SCAN_WITH_BYTES = os.name != 'nt'
+# Read once at import, before any threads: os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_SYSTEM = platform.system()  # "Windows", "Darwin", "Linux", ...; fixed for the process
+OUTPUT_BUFFER_SIZE = 1 << 20  # 1 MiB buffer for the combined output file
+WRITE_BATCH_FILES = 64  # Flush buffered file blocks after this many files...
+WRITE_BATCH_BYTES = 4 << 20  # ...or once they reach 4 MiB
+READ_WORKERS = 16  # Threads reading source files ahead of the writer
+READ_AHEAD = 64  # Max files read but not yet written, bounds memory use
+BINARY_PROBE_SIZE = 4096  # Files with a NUL byte in this prefix are treated as binary
+FENCE_CLOSE = b"\n```\n\n"  # Ends each file block after its (stripped) content
+_ASCII_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"  # ASCII chars str.strip() removes
+STATUS_LOG_MAX_LINES = 2000  # Older status log lines are dropped past this
 
 DEFAULT_INCLUDE_EXTENSIONS = [
     ".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".c", ".cpp", ".h", ".hpp",
@@ -52,66 +83,172 @@ DEFAULT_EXCLUDE_PATTERNS = [
     "coverage/", ".pytest_cache/", ".mypy_cache/", ".tox/"
 ]
 
+# Code fence language hints, by exact file name first, then by lowercased extension
+_SPECIAL_NAMES = {
+    "Dockerfile": "dockerfile", ".gitignore": "gitignore",
+    ".gitattributes": "gitattributes", ".editorconfig": "editorconfig", "LICENSE": "text"
+}
+_LANG_MAP = {
+    ".py": "python", ".js": "javascript", ".jsx": "jsx", ".ts": "typescript", ".tsx": "tsx",
+    ".java": "java", ".c": "c", ".cpp": "cpp", ".h": "c", ".hpp": "cpp", ".cs": "csharp",
+    ".go": "go", ".php": "php", ".rb": "ruby", ".swift": "swift", ".kt": "kotlin",
+    ".rs": "rust", ".scala": "scala", ".pl": "perl", ".sh": "bash", ".bash": "bash",
+    ".zsh": "zsh", ".ps1": "powershell", ".bat": "batch", ".cmd": "batch", ".html": "html",
+    ".htm": "html", ".css": "css", ".scss": "scss", ".less": "less", ".json": "json",
+    ".yaml": "yaml", ".yml": "yaml", ".xml": "xml", ".toml": "toml", ".md": "markdown",
+    ".rst": "rst", ".txt": "text", ".sql": "sql", ".graphql": "graphql"
+}
+
 # --- Core Logic Functions (Slightly modified for clarity/robustness) ---
 
 
-def is_excluded(path: Path, exclude_matcher, root_dir: Path) -> bool:
-    """Check if a file/directory path matches gitignore patterns or fnmatch."""
+def is_excluded(entry_path_str: str, name: str, relative_path_str: str, exclude_matcher,
+                is_dir: bool = False) -> bool:
+    """Check if a file/directory path matches gitignore patterns or fnmatch.
+
+    relative_path_str is the '/'-separated path under the scan root, as built by the
+    scan, so no resolve()/relative_to() filesystem work is needed here. Paths may be
+    bytes when matching against bytes ExcludeRegexes.
+    """
     try:
-        abs_path = path.resolve()
-        if exclude_matcher and hasattr(exclude_matcher, 'match'):
-            return exclude_matcher.match(abs_path)
+        if exclude_matcher and hasattr(exclude_matcher, 'match_file'):
+            # gitignore 'dir/' patterns only match paths marked as directories
+            return exclude_matcher.match_file(relative_path_str + '/' if is_dir else relative_path_str)
         # Fallback if no gitignore matcher (using fnmatch on defaults/manual list)
         # Check if it's the pattern list
-        elif exclude_matcher and isinstance(exclude_matcher, list):
-            exclude_patterns = exclude_matcher
-            # Use normalized paths (forward slashes) for pattern matching consistency
-            relative_path_str = str(abs_path.relative_to(
-                root_dir)).replace(os.sep, '/')
-            path_str_normalized = str(abs_path).replace(os.sep, '/')
-
-            for pattern in exclude_patterns:
-                normalized_pattern = pattern.replace(os.sep, '/')
-                if normalized_pattern.endswith('/'):
-                    pattern_dir = normalized_pattern.rstrip('/')
-                    # Check relative path match more robustly
-                    if relative_path_str == pattern_dir or relative_path_str.startswith(pattern_dir + '/'):
-                        return True
-                    # Check wildcard dir match
-                    if fnmatch.fnmatch(relative_path_str + '/', normalized_pattern):
-                        return True
-                # Check filename patterns
-                elif fnmatch.fnmatch(path.name, normalized_pattern):
-                    return True
-                # Check full relative path patterns
-                elif fnmatch.fnmatch(relative_path_str, normalized_pattern):
-                    return True
+        elif isinstance(exclude_matcher, ExcludeRegexes):
+            if exclude_matcher.as_bytes and not relative_path_str.isascii():
+                # Bytes regexes match '?' and '[...]' against single bytes; non-ASCII
+                # names need the str regexes to match characters like fnmatch does
+                exclude_matcher = exclude_matcher.text_regexes
+                name = os.fsdecode(name)
+                relative_path_str = os.fsdecode(relative_path_str)
+            # The scan never descends into excluded directories, so only the path
+            # itself needs checking against directory patterns, not its ancestors
+            if exclude_matcher.dir_regex and exclude_matcher.dir_regex.match(relative_path_str):
+                return True
+            if exclude_matcher.name_regex and exclude_matcher.name_regex.match(name):
+                return True
+            if exclude_matcher.path_regex and exclude_matcher.path_regex.match(relative_path_str):
+                return True
         return False  # Default to not excluded if no matcher or pattern list provided
-    except ValueError:  # Handle relative_to error if path isn't under root
-        return False
     except Exception as e:
         # Log error
-        print(f"Warning: Error during exclusion check for {path}: {e}")
+        print(f"Warning: Error during exclusion check for {entry_path_str}: {e}")
         return False  # Fail safe: treat as not excluded
 
 
-def get_language_hint(file_path: Path) -> str:
-    # (Function unchanged from previous version)
-    extension = file_path.suffix.lower()
-    name = file_path.name
-    if name == "Dockerfile" or name.lower() == ".dockerfile":
+def _filter_excluded(candidates: list[tuple], exclude_matcher) -> list[tuple]:
+    """Drops excluded (entry, relative_path, is_dir, ...) candidates of one directory."""
+    if hasattr(exclude_matcher, 'match_files'):
+        # Match the whole directory listing against the PathSpec in one call
+        keys = [relative_path_str + '/' if is_dir else relative_path_str
+                for _, relative_path_str, is_dir, _ in candidates]
+        excluded = set(exclude_matcher.match_files(keys))
+        return [candidate for candidate, key in zip(candidates, keys) if key not in excluded]
+    return [candidate for candidate in candidates
+            if not is_excluded(candidate[0].path, candidate[0].name, candidate[1],
+                               exclude_matcher, candidate[2])]
+
+
+class ExcludeRegexes(NamedTuple):
+    """fnmatch-style exclude patterns compiled into one union regex per kind."""
+    dir_regex: Optional[re.Pattern]  # 'dir/' patterns (minus the '/'), matched against 'rel/path'
+    name_regex: Optional[re.Pattern]  # Patterns without '/', matched against the name
+    path_regex: Optional[re.Pattern]  # Patterns containing '/', matched against 'rel/path'
+    as_bytes: bool  # Whether the regexes match bytes paths
+    # With as_bytes, the str equivalents used for paths that aren't pure ASCII
+    text_regexes: Optional["ExcludeRegexes"] = None
+
+
+def _compile_exclude_patterns(patterns: list[str], as_bytes: bool = False) -> ExcludeRegexes:
+    """Compiles exclude patterns once, so each check is a few regex calls in C.
+
+    With as_bytes, the regexes match bytes paths (see SCAN_WITH_BYTES); they are
+    only exact for ASCII paths, so str regexes are kept alongside in text_regexes.
+    """
+    # fnmatch.fnmatch is case-insensitive where the OS normalizes case (Windows)
+    flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+    groups = ([], [], [])
+    for pattern in patterns:
+        normalized_pattern = pattern.replace(os.sep, '/')
+        if normalized_pattern.endswith('/'):
+            # 'dir/' matching 'rel/path/' is the same as 'dir' matching 'rel/path'
+            normalized_pattern = normalized_pattern.rstrip('/')
+            group = groups[0]
+        elif '/' not in normalized_pattern:
+            group = groups[1]
+        else:
+            group = groups[2]
+        group.append(f"(?:{fnmatch.translate(normalized_pattern)})")
+    # An empty union would match everything, so leave those groups as None
+    unions = ["|".join(group) if group else None for group in groups]
+    text_regexes = ExcludeRegexes(*(re.compile(union, flags) if union else None
+                                    for union in unions), False)
+    if not as_bytes:
+        return text_regexes
+    return ExcludeRegexes(*(re.compile(os.fsencode(union), flags) if union else None
+                            for union in unions), True, text_regexes)
+
+
+def _read_source_bytes(file_path: str) -> tuple[bytes, int]:
+    """Reads a UTF-8 source file as bytes; returns (data, char_count).
+
+    Raises UnicodeDecodeError for binary content (NUL bytes or invalid UTF-8).
+    """
+    with open(file_path, "rb") as f:
+        # Binary files are rejected from the probe alone, without reading the rest
+        data = f.read(BINARY_PROBE_SIZE)
+        nul_index = data.find(b"\x00")
+        if nul_index != -1:
+            raise UnicodeDecodeError("utf-8", data, nul_index, nul_index + 1,
+                                     "NUL byte found, likely binary")
+        if len(data) == BINARY_PROBE_SIZE:
+            # Incremental decoding tolerates a character split at the probe boundary
+            codecs.getincrementaldecoder("utf-8")().decode(data)
+            data += f.read()
+    if b"\r" in data:  # Match the universal newlines of text-mode reads
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    # Decoding validates the bytes; the str itself is only used for its length
+    return data, len(data.decode("utf-8"))
+
+
+def _strip_view(data: bytes) -> memoryview:
+    """Returns UTF-8 data stripped like str.strip(), without copying in the usual case."""
+    start, end = 0, len(data)
+    # Only the (usually short) whitespace runs at either end are walked
+    while start < end and data[start] in _ASCII_WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in _ASCII_WHITESPACE:
+        end -= 1
+    if start < end and (data[start] >= 0x80 or data[end - 1] >= 0x80):
+        # A non-ASCII edge may be Unicode whitespace (NBSP, U+3000, ...); let str decide
+        text = data[start:end].decode("utf-8")
+        stripped = text.strip()
+        if len(stripped) != len(text):
+            return memoryview(stripped.encode("utf-8"))
+    return memoryview(data)[start:end]
+
+
+def _read_ahead(executor: ThreadPoolExecutor, func, items, depth: int):
+    """Like executor.map, but yields futures in order with at most `depth` in flight."""
+    in_flight = deque()
+    for item in items:
+        in_flight.append(executor.submit(func, item))
+        if len(in_flight) >= depth:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+
+def get_language_hint(name: str, suffix: str) -> str:
+    """Returns the code fence language for a file name and its lowercased suffix."""
+    special = _SPECIAL_NAMES.get(name)
+    if special is not None:
+        return special
+    if name.lower() == ".dockerfile":
         return "dockerfile"
-    if name == ".gitignore":
-        return "gitignore"
-    if name == ".gitattributes":
-        return "gitattributes"
-    if name == ".editorconfig":
-        return "editorconfig"
-    if name == "LICENSE":
-        return "text"
-    mapping = {".py": "python", ".js": "javascript", ".jsx": "jsx", ".ts": "typescript", ".tsx": "tsx", ".java": "java", ".c": "c", ".cpp": "cpp", ".h": "c", ".hpp": "cpp", ".cs": "csharp", ".go": "go", ".php": "php", ".rb": "ruby", ".swift": "swift", ".kt": "kotlin", ".rs": "rust", ".scala": "scala", ".pl": "perl", ".sh": "bash",
-               ".bash": "bash", ".zsh": "zsh", ".ps1": "powershell", ".bat": "batch", ".cmd": "batch", ".html": "html", ".htm": "html", ".css": "css", ".scss": "scss", ".less": "less", ".json": "json", ".yaml": "yaml", ".yml": "yaml", ".xml": "xml", ".toml": "toml", ".md": "markdown", ".rst": "rst", ".txt": "text", ".sql": "sql", ".graphql": "graphql"}
-    return mapping.get(extension, "")
+    return _LANG_MAP.get(suffix, "")
 
 
 def get_config_path():
@@ -123,10 +260,181 @@ def get_config_path():
     return app_dir / CONFIG_FILENAME
 
 
-def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_exts: list[str],
+def _write_file_atomic(path: Path, payload: bytes):
+    """Writes payload to path through a temp file in the same directory and
+    os.replace, so a crash mid-write never leaves a truncated file behind."""
+    tmp_name = None
+    try:
+        with tempfile.NamedTemporaryFile("wb", dir=path.parent, prefix=path.name + ".",
+                                         suffix=".tmp", delete=False) as tf:
+            tmp_name = tf.name
+            tf.write(payload)  # One write() for the whole payload
+            tf.flush()
+            os.fsync(tf.fileno())
+        # mkstemp creates the file 0600; keep the mode the target had (or would get)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+        raise
+
+
+def _scan_tree(root_path: Path, exclude_matcher, include_exts_set: frozenset,
+               include_names_set: frozenset, status_queue: queue.Queue,
+               cancel_event: threading.Event) -> tuple[list[tuple[str, str, str]], int]:
+    """Walks root_path with a pool of os.scandir workers.
+
+    Each worker takes a directory off a shared queue and pushes the subdirectories it
+    finds back onto it, so slow (network) mounts are listed concurrently.
+
+    Returns the included files as (relative_dir, name, lang_hint) tuples and the sum
+    of their sizes in bytes. relative_dir uses forward slashes and ends with one
+    ('' for the root), so relative_dir + name is the file's relative path.
+    """
+    root_str = str(root_path)
+    if isinstance(exclude_matcher, ExcludeRegexes) and exclude_matcher.as_bytes:
+        # Names stay bytes as readdir returns them; only included files get decoded
+        scan_root, sep, slash, dot = os.fsencode(root_str), os.fsencode(os.sep), b'/', b'.'
+        include_exts_set = frozenset(os.fsencode(ext) for ext in include_exts_set)
+        include_names_set = frozenset(os.fsencode(name) for name in include_names_set)
+    else:
+        scan_root, sep, slash, dot = root_str, os.sep, '/', '.'
+    root_prefix_len = len(os.path.join(scan_root, sep[:0]))
+    pending = queue.Queue()
+    pending.put(scan_root)
+    state = {'tasks': 1}  # Directories queued or currently being scanned
+    tasks_changed = threading.Condition()
+
+    def scan_worker():
+        files = []  # Per-worker results, merged once all workers are done
+        total_size = 0
+        while True:
+            current_path = pending.get()
+            if current_path is None:  # Shutdown sentinel
+                return files, total_size
+            try:
+                if cancel_event.is_set():
+                    continue  # Drain the queue without scanning
+                candidates = []  # (entry, relative_path, is_dir, suffix)
+                # Slicing off the root is cheaper than Path.relative_to
+                rel_dir = current_path[root_prefix_len:].replace(sep, slash)
+                if rel_dir:
+                    rel_dir += slash
+                # One prefix string is shared by every file in this directory
+                rel_dir_str = os.fsdecode(rel_dir)
+                with os.scandir(current_path) as it:
+                    for entry in it:
+                        # DirEntry.is_dir/is_file reuse the d_type from readdir, no extra stat()
+                        if entry.is_dir(follow_symlinks=False):
+                            candidates.append(
+                                (entry, rel_dir + entry.name, True, None))
+                        # Symlinked files are still followed (only those cost a stat)
+                        elif entry.is_file():
+                            name = entry.name
+                            dot_index = name.rfind(dot)
+                            suffix = name[dot_index:].lower() if dot_index >= 0 else name[:0]
+                            if suffix in include_exts_set or name in include_names_set:
+                                candidates.append(
+                                    (entry, rel_dir + name, False, suffix))
+
+                for entry, relative_path, is_dir, suffix in _filter_excluded(candidates, exclude_matcher):
+                    if is_dir:
+                        with tasks_changed:
+                            state['tasks'] += 1
+                        pending.put(entry.path)
+                    else:
+                        # os.fsdecode is a no-op for str paths
+                        name = os.fsdecode(entry.name)
+                        files.append((rel_dir_str, name,
+                                      get_language_hint(name, os.fsdecode(suffix))))
+                        # Regular files get the lstat result (cached from the listing on
+                        # Windows, one syscall on POSIX); only symlinks need a real stat
+                        total_size += entry.stat().st_size
+            except PermissionError:
+                status_queue.put(
+                    ('status', f"Warning: Permission denied scanning: {os.path.relpath(os.fsdecode(current_path), root_str)}"))
+            except OSError as e:
+                status_queue.put(
+                    ('status', f"Warning: Error scanning {os.path.relpath(os.fsdecode(current_path), root_str)}: {e}"))
+            finally:
+                with tasks_changed:
+                    state['tasks'] -= 1
+                    if not state['tasks']:
+                        tasks_changed.notify_all()
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        futures = [executor.submit(scan_worker) for _ in range(SCAN_WORKERS)]
+        with tasks_changed:
+            tasks_changed.wait_for(lambda: not state['tasks'])
+        for _ in futures:
+            pending.put(None)
+
+    files = []
+    total_size = 0
+    for future in futures:
+        worker_files, worker_size = future.result()
+        files.extend(worker_files)
+        total_size += worker_size
+    return files, total_size
+
+
+def build_exclude_matcher(root_path: Path, exclude_patterns: list[str], use_gitignore: bool):
+    """Builds the exclude matcher for root_path.
+
+    Returns (matcher, notes): a PathSpec when .gitignore is used, otherwise
+    ExcludeRegexes, plus the status-queue messages describing the choice.
+    """
+    notes = []
+    # Dedupe keeping first-seen order: PathSpec applies '!' negations in order,
+    # and a stable order keeps the compiled regexes identical between runs
+    final_exclude_patterns = list(
+        dict.fromkeys(DEFAULT_EXCLUDE_PATTERNS + exclude_patterns))
+    gitignore_path = root_path / ".gitignore"
+    # Create the matcher based on settings
+    if use_gitignore and GITIGNORE_AVAILABLE and gitignore_path.is_file():
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8') as gf:
+                # One compiled spec covers .gitignore, defaults and manual excludes
+                exclude_matcher = pathspec.GitIgnoreSpec.from_lines(
+                    gf.read().splitlines() + final_exclude_patterns)
+            notes.append(
+                ('status', f"Using exclusions from: {gitignore_path}"))
+        except Exception as e:
+            notes.append(('error', "gitignore Parse Error",
+                          f"Could not read or parse .gitignore: {e}\nUsing manual excludes only."))
+            # Pass compiled patterns for fnmatch fallback
+            exclude_matcher = _compile_exclude_patterns(
+                final_exclude_patterns, as_bytes=SCAN_WITH_BYTES)
+    else:
+        # Pass compiled patterns for fnmatch fallback
+        exclude_matcher = _compile_exclude_patterns(
+            final_exclude_patterns, as_bytes=SCAN_WITH_BYTES)
+        if use_gitignore and not gitignore_path.is_file():
+            notes.append(
+                ('status', "Info: '.gitignore' file not found in root directory. Using manual excludes."))
+        elif use_gitignore and not GITIGNORE_AVAILABLE:
+            notes.append(
+                ('status', "Warning: pathspec not installed. Using manual excludes."))
+    return exclude_matcher, notes
+
+
+def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_exts: frozenset,
                             exclude_patterns: list[str], use_gitignore: bool,
-                            status_queue: queue.Queue, cancel_event: threading.Event):
-    """Worker function: scans, counts chars, combines, reports status/progress/errors."""
+                            status_queue: queue.Queue, cancel_event: threading.Event,
+                            prepared_matcher: Optional[tuple] = None):
+    """Worker function: scans, counts chars, combines, reports status/progress/errors.
+
+    prepared_matcher is an optional (matcher, notes) pair from
+    build_exclude_matcher(); when given, the worker skips building its own.
+    """
     files_to_process = []
     exclude_matcher = None
     total_chars = 0
@@ -138,30 +446,17 @@ def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_ext
 
         status_queue.put(('status', f"Preparing exclude patterns..."))
         # --- Prepare Exclusions ---
-        final_exclude_patterns = list(
-            set(DEFAULT_EXCLUDE_PATTERNS + exclude_patterns))
-        gitignore_path = root_path / ".gitignore"
-        # Create the matcher based on settings
-        if use_gitignore and GITIGNORE_AVAILABLE and gitignore_path.is_file():
-            try:
-                with open(gitignore_path, 'r', encoding='utf-8') as gf:
-                    exclude_matcher = gitignore_parser.parse(gf)
-                status_queue.put(
-                    ('status', f"Using exclusions from: {gitignore_path}"))
-            except Exception as e:
-                status_queue.put(('error', "gitignore Parse Error",
-                                 f"Could not read or parse .gitignore: {e}\nUsing manual excludes only."))
-                # Pass pattern list for fnmatch fallback
-                exclude_matcher = final_exclude_patterns
-        else:
-            # Pass pattern list for fnmatch fallback
-            exclude_matcher = final_exclude_patterns
-            if use_gitignore and not gitignore_path.is_file():
-                status_queue.put(
-                    ('status', "Info: '.gitignore' file not found in root directory. Using manual excludes."))
-            elif use_gitignore and not GITIGNORE_AVAILABLE:
-                status_queue.put(
-                    ('status', "Warning: python-gitignore not installed. Using manual excludes."))
+        # Split includes once so the scan only does two set lookups per file.
+        # Every entry stays in the name set too: '.env.example' only matches by name
+        include_exts_set = frozenset(ext.lower()
+                                     for ext in include_exts if ext.startswith('.'))
+        include_names_set = frozenset(include_exts)
+        if prepared_matcher is None:
+            prepared_matcher = build_exclude_matcher(
+                root_path, exclude_patterns, use_gitignore)
+        exclude_matcher, notes = prepared_matcher
+        for note in notes:
+            status_queue.put(note)
 
         # --- Step 1: Scan & Collect Files ---
         status_queue.put(('status', f"Scanning directory: {root_path}"))
@@ -169,51 +464,12 @@ def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_ext
         status_queue.put(('progress_mode', 'indeterminate', None))
         start_time = time.time()
 
-        paths_to_scan = [root_path]
-        # Add root initially to avoid reprocessing if it's passed again
-        processed_dirs = {root_path}
-
-        while paths_to_scan:
-            if cancel_event.is_set():
-                status_queue.put(
-                    ('done', False, "Cancelled by user during scan."))
-                return
-
-            current_path = paths_to_scan.pop(0)
-            if not current_path.exists():
-                continue
-
-            # Check exclusion (works for both files and dirs)
-            if current_path != root_path and is_excluded(current_path, exclude_matcher, root_path):
-                continue
-
-            if current_path.is_dir():
-                try:
-                    items = list(current_path.iterdir())  # Get items first
-                    for item in items:
-                        if item.is_dir() and item not in processed_dirs:
-                            processed_dirs.add(item)
-                            paths_to_scan.append(item)
-                        elif item.is_file():
-                            # Check file exclusion immediately
-                            if not is_excluded(item, exclude_matcher, root_path):
-                                # Check include extensions
-                                if item.suffix.lower() in include_exts or item.name in include_exts:
-                                    files_to_process.append(item)
-
-                except PermissionError:
-                    status_queue.put(
-                        ('status', f"Warning: Permission denied scanning: {current_path.relative_to(root_path)}"))
-                except OSError as e:
-                    status_queue.put(
-                        ('status', f"Warning: Error scanning {current_path.relative_to(root_path)}: {e}"))
-            # Files encountered directly at root (or passed via non-dir scan?) handled by iterdir above
-            # This block might be redundant if starting with root_path only
-            # elif current_path.is_file():
-            #      if not is_excluded(current_path, exclude_matcher, root_path):
-            #          if current_path.suffix.lower() in include_exts or current_path.name in include_exts:
-            #              if current_path not in files_to_process: # Avoid duplicates
-            #                  files_to_process.append(current_path)
+        files_to_process, total_size = _scan_tree(
+            root_path, exclude_matcher, include_exts_set, include_names_set,
+            status_queue, cancel_event)
+        if cancel_event.is_set():
+            status_queue.put(('done', False, "Cancelled by user during scan."))
+            return
 
         scan_duration = time.time() - start_time
         status_queue.put(
@@ -227,26 +483,13 @@ def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_ext
             status_queue.put(('done', False, "No files included."))
             return
 
-        # --- Step 2: Estimate Size (Character Count) ---
-        status_queue.put(('status', f"Estimating total size..."))
-        for i, file_path in enumerate(sorted(files_to_process)):
-            if cancel_event.is_set():
-                status_queue.put(
-                    ('done', False, "Cancelled by user during size estimation."))
-                return
-            status_queue.put(
-                ('current_file', f"Estimating: {file_path.relative_to(root_path)}"))
-            # Update progress during estimation
-            status_queue.put(('progress', i + 1, len(files_to_process)))
-            try:
-                total_chars += len(file_path.read_text(encoding="utf-8"))
-            except Exception:
-                pass  # Ignore errors during estimation, handle properly during writing
-        status_queue.put(('total_chars', total_chars))  # Send total char count
+        # --- Step 2: Estimate Size ---
+        # File sizes were collected during the scan; bytes are an upper bound on chars
+        status_queue.put(('size_estimate', total_size))
 
         # --- Step 3: Write Output ---
         status_queue.put(
-            ('status', f"Writing {len(files_to_process)} files ({total_chars:,} chars) to: {output_path.name}"))
+            ('status', f"Writing {len(files_to_process)} files (~{total_size:,} bytes) to: {output_path.name}"))
         # Reset progress for writing phase
         status_queue.put(('progress_mode', 'determinate',
                          (0, len(files_to_process))))
@@ -255,41 +498,75 @@ def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_ext
         written_count = 0
         total_files_to_write = len(files_to_process)
 
-        with open(output_path, "w", encoding="utf-8") as outfile:
-            for i, file_path in enumerate(sorted(files_to_process)):
+        # Whole file blocks are encoded once and written in batches, bypassing
+        # TextIOWrapper's per-write overhead and newline translation
+        write_buffer = []
+        buffered_files = 0
+        buffered_bytes = 0
+        # Sort on plain strings rather than Paths; mapping '/' to '\0' keeps the
+        # per-component order Path sorting had (a/x before a-b/x)
+        if os.name == 'nt':
+            # WindowsPath ordering ignored case (it compares lowercased parts)
+            files_to_process.sort(
+                key=lambda f: (f[0] + f[1]).lower().replace('/', '\0'))
+        else:
+            files_to_process.sort(
+                key=lambda f: (f[0] + f[1]).replace('/', '\0'))
+        root_str = str(root_path)
+        file_paths = [os.path.join(root_str, rel_dir, name)
+                      for rel_dir, name, _ in files_to_process]
+        # Reader threads fetch upcoming files while this thread writes in order
+        with open(output_path, "wb", buffering=OUTPUT_BUFFER_SIZE) as outfile, \
+                ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+            reads = _read_ahead(executor, _read_source_bytes,
+                                file_paths, READ_AHEAD)
+            for i, ((rel_dir, name, lang_hint), read_future) in enumerate(zip(files_to_process, reads)):
+                relative_path_str = rel_dir + name
                 if cancel_event.is_set():
                     status_queue.put(
                         ('done', False, "Cancelled by user during write."))
                     return
 
-                relative_path_str = str(file_path.relative_to(
-                    root_path)).replace(os.sep, '/')
-                status_queue.put(('current_file', relative_path_str))
-                status_queue.put(('progress', i + 1, total_files_to_write))
+                if not i & 15:  # Every 16th file is plenty for the GUI
+                    status_queue.put(('current_file', relative_path_str))
+                    status_queue.put(('progress', i + 1, total_files_to_write))
 
-                outfile.write(f"# File: {relative_path_str}\n\n")
-                lang_hint = get_language_hint(file_path)
-                outfile.write(f"```{lang_hint}\n")
+                # Names that aren't valid UTF-8 (surrogate escapes) must not abort the run
+                header = f"# File: {relative_path_str}\n\n```{lang_hint}\n".encode(
+                    "utf-8", "replace")
                 try:
-                    content = file_path.read_text(encoding="utf-8")
-                    outfile.write(content.strip() + "\n")
+                    data, char_count = read_future.result()
+                    body = _strip_view(data)
                     written_count += 1
+                    total_chars += char_count
                 except UnicodeDecodeError:
-                    outfile.write(
-                        "--- Error: Could not decode file content (likely binary) ---\n")
+                    body = b"--- Error: Could not decode file content (likely binary) ---"
                     status_queue.put(
                         ('status', f"Warning: Skipped binary file: {relative_path_str}"))
                 except PermissionError:
-                    outfile.write(
-                        f"--- Error reading file: Permission Denied ---\n")
+                    body = b"--- Error reading file: Permission Denied ---"
                     status_queue.put(
                         ('error', 'File Read Error', f"Permission denied reading: {relative_path_str}"))
                 except Exception as e:
-                    outfile.write(f"--- Error reading file: {e} ---\n")
+                    body = f"--- Error reading file: {e} ---".encode("utf-8")
                     status_queue.put(
                         ('error', 'File Read Error', f"Error reading {relative_path_str}: {e}"))
-                outfile.write("```\n\n")
 
+                write_buffer += (header, body, FENCE_CLOSE)
+                buffered_files += 1
+                buffered_bytes += len(header) + len(body) + len(FENCE_CLOSE)
+                if buffered_files >= WRITE_BATCH_FILES or buffered_bytes >= WRITE_BATCH_BYTES:
+                    # writelines loops in C; parts bigger than the file buffer (large
+                    # files) go straight to the OS without being copied
+                    outfile.writelines(write_buffer)
+                    write_buffer.clear()
+                    buffered_files = buffered_bytes = 0
+                if (i + 1) % 50 == 0:  # Keep the running char count fresh
+                    status_queue.put(('total_chars', total_chars))
+
+            outfile.writelines(write_buffer)
+
+        status_queue.put(('total_chars', total_chars))
         write_duration = time.time() - start_time
         final_message = f"Successfully combined {written_count}/{total_files_to_write} files ({total_chars:,} chars) into '{output_path.name}' in {write_duration:.2f} seconds."
         status_queue.put(('status', final_message))
@@ -311,6 +588,74 @@ def combine_codebase_worker(root_dir_str: str, output_file_str: str, include_ext
 
 # --- GUI Application Class ---
 
+def _existing_dir(dir_path: str) -> Optional[str]:
+    """Returns dir_path if it is a directory, else None.
+
+    Tk file dialogs can drop trailing blanks from a directory name, so up to
+    three trailing spaces are tried before giving up.
+    """
+    for padding in ("", " ", "  ", "   "):
+        if os.path.isdir(dir_path + padding):
+            return dir_path + padding
+    return None
+
+
+def _normalize_include(include_str: str) -> frozenset:
+    """Parses the comma-separated include field into a set of entries.
+
+    Entries with a dot but no leading one ('env.example') get a '.' prepended;
+    bare names such as 'Dockerfile' are kept as typed.
+    """
+    return frozenset(ext if ext.startswith('.') or '.' not in ext else '.' + ext
+                     for ext in (e.strip() for e in include_str.split(',')) if ext)
+
+
+def _clock_time() -> str:
+    """Local time as HH:MM:SS for status log lines, without strftime."""
+    t = time.localtime()
+    return f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+
+
+class _StatusQueue(queue.Queue):
+    """Queue that wakes the GUI with a virtual event when the worker posts to it.
+
+    Only one event is outstanding at a time: the GUI calls acknowledge() before
+    draining, and the next put() after that generates a new event.
+    """
+
+    def __init__(self, widget, event_name: str):
+        super().__init__()
+        self._widget = widget
+        self._event_name = event_name
+        self._notify_pending = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if not self._notify_pending.is_set():
+            self._notify_pending.set()
+            try:
+                self._widget.event_generate(self._event_name, when="tail")
+            except (RuntimeError, tkinter.TclError):
+                pass  # Window gone or Tk not reachable; the fallback poll drains it
+
+    def acknowledge(self):
+        self._notify_pending.clear()
+
+    def drain_all(self) -> list:
+        """Removes and returns every queued item under a single lock acquisition."""
+        with self.mutex:
+            items = list(self.queue)
+            self.queue.clear()
+            self.not_full.notify_all()
+        return items
+
+    def requeue(self, items):
+        """Puts drained items back at the front of the queue, in order."""
+        if items:
+            with self.mutex:
+                self.queue.extendleft(reversed(items))
+
+
 class CodeCombinerApp(customtkinter.CTk):
     def __init__(self):
         super().__init__()
@@ -332,14 +677,24 @@ class CodeCombinerApp(customtkinter.CTk):
         self.input_dir_path = tkinter.StringVar(
             value=self.settings.get("last_input_dir", ""))
         self.output_file_path = tkinter.StringVar()
+        # Last-used dialog dirs live here; self.settings only gets them at save time
+        self.last_input_dir = self.settings.get(
+            "last_input_dir", "") or str(Path.home())
         # Load last output dir, but not filename
         last_output_dir = self.settings.get("last_output_dir", "")
         self.last_output_dir = last_output_dir if last_output_dir else str(
             Path.home())
+        self._validated_dirs = set()  # Dialog start dirs already known to exist
 
-        self.status_queue = queue.Queue()
+        self.status_queue = _StatusQueue(self, "<<StatusUpdate>>")
+        self._status_poll_id = None  # Fallback after() poll while a worker runs
+        self._draining_status = False  # Set while process_status_queue handles messages
         self.processing_thread = None
         self.cancel_event = threading.Event()
+        # Compiled exclude matchers, keyed by root, .gitignore mtime and settings
+        self._matcher_cache = {}
+        # (include text, exclude text, include set, exclude list) of the last run
+        self._filter_entries_cache = (None, None, frozenset(), [])
         self.current_file_var = tkinter.StringVar(value="N/A")
         self.char_count_var = tkinter.StringVar(value="Est. Chars: N/A")
         self.char_threshold_var = tkinter.StringVar(
@@ -348,13 +703,16 @@ class CodeCombinerApp(customtkinter.CTk):
         self._create_menu()
         self._create_widgets()
         self._apply_loaded_settings()  # Populate widgets with loaded settings
+        self._mark_settings_saved()
         self.check_paths_set()  # Initial check for button state
-        self.process_status_queue()  # Start queue polling
+        # The worker's queue wakes the GUI through this event instead of constant polling
+        self.bind("<<StatusUpdate>>", lambda event: self.process_status_queue())
+        self.process_status_queue()  # Drain anything already queued
 
     def _create_menu(self):
         self.menu_bar = tkinter.Menu(self)
         # On macOS, the menu doesn't automatically appear without this setup
-        if platform.system() == "Darwin":
+        if _SYSTEM == "Darwin":
             app_menu = tkinter.Menu(self.menu_bar, name='apple')
             self.menu_bar.add_cascade(menu=app_menu)
             # Add standard macOS items if desired (e.g., app_menu.add_command(label='About...'))
@@ -591,7 +949,7 @@ class CodeCombinerApp(customtkinter.CTk):
         if not GITIGNORE_AVAILABLE:
             # Update text here if tooltip is removed, to give user context
             self.gitignore_checkbox.configure(
-                state="disabled", text="Use .gitignore (requires python-gitignore)")
+                state="disabled", text="Use .gitignore (requires pathspec)")
         threshold_label = customtkinter.CTkLabel(
             options_frame, text="Warn if Chars >")
         threshold_label.grid(row=0, column=2, padx=(0, 5), sticky="e")
@@ -610,7 +968,7 @@ class CodeCombinerApp(customtkinter.CTk):
             config_btn_frame, text="Save Settings Now", command=self._save_settings)
         save_settings_button.grid(row=0, column=0, padx=5, pady=5, sticky="e")
         load_settings_button = customtkinter.CTkButton(
-            config_btn_frame, text="Reload Saved Settings", command=self._load_settings)
+            config_btn_frame, text="Reload Saved Settings", command=self._reload_settings)
         load_settings_button.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
         # --- Set Window Icon ---
@@ -626,7 +984,7 @@ class CodeCombinerApp(customtkinter.CTk):
         else:
             app_dir = Path(__file__).parent
         potential_icon = app_dir / "checker_icon.ico"  # Assumed name
-        if potential_icon.exists() and platform.system() == "Windows":
+        if potential_icon.exists() and _SYSTEM == "Windows":
             icon_path = str(potential_icon)
             try:
                 self.iconbitmap(default=icon_path)
@@ -658,10 +1016,13 @@ class CodeCombinerApp(customtkinter.CTk):
         }
         try:
             if config_file.exists():
-                with open(config_file, "r", encoding="utf-8") as f:
-                    loaded_settings = json.load(f)
-                    # Merge loaded settings with defaults (defaults provide missing keys)
-                    default_settings.update(loaded_settings)
+                if orjson:
+                    loaded_settings = orjson.loads(config_file.read_bytes())
+                else:
+                    with open(config_file, "r", encoding="utf-8") as f:
+                        loaded_settings = json.load(f)
+                # Merge loaded settings with defaults (defaults provide missing keys)
+                default_settings.update(loaded_settings)
                 if not initial:
                     self.update_status(
                         f"Settings loaded from {config_file.name}")
@@ -677,88 +1038,155 @@ class CodeCombinerApp(customtkinter.CTk):
                     "Settings Error", f"Could not load settings from {config_file.name}:\n{e}")
         return default_settings  # Return merged/default settings
 
+    def _reload_settings(self):
+        """Re-reads the config file and applies it to the widgets."""
+        self.settings = self._load_settings()
+        self._apply_loaded_settings()
+        self._mark_settings_saved()
+
+    def _mark_settings_saved(self):
+        """Records the widgets' current values as matching the config file."""
+        try:
+            self._saved_settings_digest = self._settings_digest(
+                self._collect_settings())
+        except ValueError:
+            self._saved_settings_digest = None
+
     def _apply_loaded_settings(self):
         """Applies the loaded self.settings to the GUI widgets."""
-        self.include_entry.delete(0, "end")
-        self.include_entry.insert(0, ", ".join(self.settings.get(
-            "include_extensions", DEFAULT_INCLUDE_EXTENSIONS)))
+        # Only rewrite widgets whose text differs, sparing a redraw and the cursor
+        include_text = ", ".join(self.settings.get(
+            "include_extensions", DEFAULT_INCLUDE_EXTENSIONS))
+        if self.include_entry.get() != include_text:
+            self.include_entry.delete(0, "end")
+            self.include_entry.insert(0, include_text)
+
+        exclude_text = "\n".join(
+            self.settings.get("exclude_patterns", DEFAULT_EXCLUDE_PATTERNS))
+        if self.exclude_textbox.get("1.0", "end-1c") != exclude_text:
+            self.exclude_textbox.delete("1.0", "end")
+            self.exclude_textbox.insert("1.0", exclude_text)
+
+        use_gitignore = self.settings.get("use_gitignore", False)
+        if self.use_gitignore_var.get() != use_gitignore:
+            self.use_gitignore_var.set(use_gitignore)
+        char_threshold = str(self.settings.get(
+            "char_threshold", DEFAULT_CHAR_THRESHOLD))
+        if self.char_threshold_var.get() != char_threshold:
+            self.char_threshold_var.set(char_threshold)
+        # Input/Output paths already set in __init__ from loaded settings
 
-        self.exclude_textbox.delete("1.0", "end")
-        self.exclude_textbox.insert("1.0", "\n".join(
-            self.settings.get("exclude_patterns", DEFAULT_EXCLUDE_PATTERNS)))
+    def _collect_settings(self):
+        """Returns self.settings updated with the current widget values.
 
-        self.use_gitignore_var.set(self.settings.get("use_gitignore", False))
-        self.char_threshold_var.set(
-            str(self.settings.get("char_threshold", DEFAULT_CHAR_THRESHOLD)))
-        # Input/Output paths already set in __init__ from loaded settings
+        Raises ValueError if the character threshold isn't a number.
+        """
+        settings = dict(self.settings)
+        # Sorted so the file and the settings digest don't depend on set order
+        settings["include_extensions"] = sorted(
+            _normalize_include(self.include_entry.get()))
+
+        exclude_str = self.exclude_textbox.get("1.0", "end-1c")
+        settings["exclude_patterns"] = [patt for patt in (
+            p.strip() for p in exclude_str.splitlines()) if patt]
+
+        settings["use_gitignore"] = self.use_gitignore_var.get()
+        settings["appearance_mode"] = self.appearance_mode_var.get()
+        # Save selected theme
+        settings["color_theme"] = self.color_theme_var.get()
+        settings["last_input_dir"] = self.input_dir_path.get() or self.last_input_dir
+        settings["last_output_dir"] = str(Path(self.output_file_path.get(
+        )).parent) if self.output_file_path.get() else self.last_output_dir
+        settings["char_threshold"] = int(self.threshold_entry.get())
+        return settings
+
+    @staticmethod
+    def _settings_digest(settings):
+        """Order-independent fingerprint used to detect unsaved changes."""
+        return hash(json.dumps(settings, sort_keys=True))
+
+    @staticmethod
+    def _serialize_settings(settings) -> bytes:
+        """Encodes settings as the JSON bytes stored in the config file."""
+        if orjson:
+            return orjson.dumps(
+                settings, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+        return json.dumps(settings, indent=4).encode("utf-8")
 
     def _save_settings(self):
         """Saves current settings to the JSON config file."""
         config_file = get_config_path()
         try:
-            include_str = self.include_entry.get()
-            self.settings["include_extensions"] = [ext for ext in (
-                e.strip() for e in include_str.split(',')) if ext]
-
-            exclude_str = self.exclude_textbox.get("1.0", "end-1c")
-            self.settings["exclude_patterns"] = [patt for patt in (
-                p.strip() for p in exclude_str.splitlines()) if patt]
-
-            self.settings["use_gitignore"] = self.use_gitignore_var.get()
-            self.settings["appearance_mode"] = self.appearance_mode_var.get()
-            # Save selected theme
-            self.settings["color_theme"] = self.color_theme_var.get()
-            self.settings["last_input_dir"] = self.input_dir_path.get() or str(
-                Path.home())
-            self.settings["last_output_dir"] = str(Path(self.output_file_path.get(
-            )).parent) if self.output_file_path.get() else self.last_output_dir
-
             try:
-                self.settings["char_threshold"] = int(
-                    self.threshold_entry.get())
+                self.settings = self._collect_settings()
             except ValueError:
                 messagebox.showerror(
                     "Settings Error", "Invalid character threshold. Please enter a number.")
                 return  # Don't save if threshold is invalid
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, indent=4)
+            _write_file_atomic(
+                config_file, self._serialize_settings(self.settings))
+            self._saved_settings_digest = self._settings_digest(self.settings)
             self.update_status(f"Settings saved to {config_file.name}")
         except Exception as e:
             self.update_status(f"Error saving settings: {e}")
             messagebox.showerror(
                 "Settings Error", f"Could not save settings to {config_file.name}:\n{e}")
 
+    def _dialog_initial_dir(self, last_dir):
+        """Returns last_dir if it is a directory, else the home directory.
+
+        Directories that passed once are remembered, so reopening a dialog
+        doesn't stat a (possibly slow network) path again.
+        """
+        if last_dir in self._validated_dirs:
+            return last_dir
+        if last_dir and Path(last_dir).is_dir():
+            self._validated_dirs.add(last_dir)
+            return last_dir
+        return str(Path.home())
+
     def browse_directory(self):
-        last_dir = self.input_dir_path.get() or self.settings.get(
-            "last_input_dir", str(Path.home()))
+        last_dir = self.input_dir_path.get() or self.last_input_dir
         dir_path = tkinter.filedialog.askdirectory(
             title="Select Codebase Root Directory",
-            initialdir=last_dir if Path(
-                last_dir).is_dir() else str(Path.home())
+            initialdir=self._dialog_initial_dir(last_dir)
         )
         if dir_path:
+            checked_path = _existing_dir(dir_path)
+            if checked_path is None:
+                # Fail now instead of after the worker has been started
+                messagebox.showerror(
+                    "Input Error", f"Selected directory not found:\n{dir_path}")
+                return
+            dir_path = checked_path
             self.input_dir_path.set(dir_path)
-            # Update setting immediately for next time
-            self.settings["last_input_dir"] = dir_path
+            # Remember for next time
+            self.last_input_dir = dir_path
+            self._validated_dirs.add(dir_path)
             self.check_paths_set()
 
     def select_output_file(self):
         last_dir = self.last_output_dir  # Get stored dir
         file_path = tkinter.filedialog.asksaveasfilename(
             title="Select Output Markdown File",
-            initialdir=last_dir if Path(
-                last_dir).is_dir() else str(Path.home()),
+            initialdir=self._dialog_initial_dir(last_dir),
             defaultextension=".md",
             filetypes=[("Markdown files", "*.md"),
                        ("Text files", "*.txt"), ("All files", "*.*")]
         )
         if file_path:
+            output_dir, file_name = os.path.split(file_path)
+            checked_dir = _existing_dir(output_dir)
+            if checked_dir is None:
+                messagebox.showerror(
+                    "Output Error", f"Output folder not found:\n{output_dir}")
+                return
+            file_path = os.path.join(checked_dir, file_name)
             self.output_file_path.set(file_path)
             self.last_output_dir = str(
                 Path(file_path).parent)  # Update last dir used
-            # Update internal cache
-            self.settings["last_output_dir"] = self.last_output_dir
+            self._validated_dirs.add(self.last_output_dir)
             self.check_paths_set()
 
     def check_paths_set(self):
@@ -778,10 +1206,19 @@ class CodeCombinerApp(customtkinter.CTk):
             state="normal" if output_dir_valid else "disabled")
 
     def update_status(self, message):
-        # (Method unchanged - adds timestamp)
+        # Adds timestamp
+        self._append_status_text(f"[{_clock_time()}] {message}\n")
+
+    def _append_status_text(self, text):
+        """Appends text to the status log with a single insert and scroll."""
         self.status_textbox.configure(state="normal")
-        self.status_textbox.insert(
-            "end", f"[{time.strftime('%H:%M:%S')}] {message}\n")
+        self.status_textbox.insert("end", text)
+        # Trim the oldest lines so the Text widget doesn't grow without bound;
+        # 'end-1c' sits on the empty line after the final newline
+        last_line = int(self.status_textbox.index("end-1c").split(".")[0])
+        if last_line - 1 > STATUS_LOG_MAX_LINES:
+            self.status_textbox.delete(
+                "1.0", f"{last_line - STATUS_LOG_MAX_LINES}.0")
         self.status_textbox.see("end")  # Auto-scroll
         self.status_textbox.configure(state="disabled")
 
@@ -798,18 +1235,61 @@ class CodeCombinerApp(customtkinter.CTk):
         self.current_file_var.set(filename if filename else "N/A")
 
     def process_status_queue(self):
-        """Checks the queue for messages and updates the GUI."""
-        try:
-            while True:  # Process all messages currently in queue
-                message_type, *payload = self.status_queue.get_nowait()
+        """Checks the queue for messages and updates the GUI.
+
+        Progress, current file and char count only keep their latest value per drain,
+        and status lines are inserted into the log together, so a fast worker doesn't
+        cause one redraw per message.
 
+        Runs on each <<StatusUpdate>> event, with a slow after() poll as a safety net.
+        """
+        if self._draining_status:
+            # Re-entered from a popup's event loop; the outer drain still holds
+            # older messages, so leave newer ones queued to keep them in order
+            return
+        if self._status_poll_id is not None:
+            self.after_cancel(self._status_poll_id)
+            self._status_poll_id = None
+        # Clear first: anything queued from here on raises a fresh event
+        self.status_queue.acknowledge()
+        latest = {}  # Coalesced message type -> latest payload
+        status_lines = []  # Timestamped log lines not yet inserted
+        timestamp = None  # One timestamp serves the whole drain
+
+        def apply_latest():
+            if status_lines:
+                self._append_status_text("".join(status_lines))
+                status_lines.clear()
+            if "progress" in latest and self.progress_bar_mode == 'determinate':
+                self.update_progress(*latest["progress"])
+            if "current_file" in latest:
+                self.update_current_file(latest["current_file"][0])
+            if "total_chars" in latest:
+                # Running count while writing, no threshold check
+                self.char_count_var.set(
+                    f"Chars: {latest['total_chars'][0]:,}")
+            latest.clear()
+
+        self._draining_status = True
+        messages = []
+        index = -1
+        try:
+            # One lock acquisition takes everything the worker has queued so far
+            messages = self.status_queue.drain_all()
+            for index, (message_type, *payload) in enumerate(messages):
                 if message_type == "status":
-                    self.update_status(payload[0])
-                elif message_type == "progress":
-                    # Only update if in determinate mode
-                    if self.progress_bar_mode == 'determinate':
-                        self.update_progress(payload[0], payload[1])
-                elif message_type == "progress_mode":
+                    if timestamp is None:
+                        timestamp = _clock_time()
+                    status_lines.append(f"[{timestamp}] {payload[0]}\n")
+                    continue
+                if message_type in ("progress", "current_file", "total_chars"):
+                    latest[message_type] = payload
+                    continue
+                # Apply pending updates first so they can't overwrite newer state
+                # and the log is current before any popup
+                apply_latest()
+
+                if message_type == "progress_mode":
                     mode, data = payload
                     self.progress_bar_mode = mode
                     if mode == 'indeterminate':
@@ -820,15 +1300,14 @@ class CodeCombinerApp(customtkinter.CTk):
                         self.progress_bar.configure(mode='determinate')
                         if data:
                             self.update_progress(data[0], data[1])
-                elif message_type == "current_file":
-                    self.update_current_file(payload[0])
-                elif message_type == "total_chars":
-                    total_chars = payload[0]
-                    self.char_count_var.set(f"Est. Chars: {total_chars:,}")
+                elif message_type == "size_estimate":
+                    estimated_chars = payload[0]
+                    self.char_count_var.set(
+                        f"Est. Chars: ~{estimated_chars:,}")
                     try:
                         threshold = int(self.threshold_entry.get())
-                        if total_chars > threshold:
-                            warning_msg = f"Estimated character count ({total_chars:,}) exceeds warning threshold ({threshold:,})."
+                        if estimated_chars > threshold:
+                            warning_msg = f"Estimated character count (~{estimated_chars:,}) exceeds warning threshold ({threshold:,})."
                             self.update_status(f"Warning: {warning_msg}")
                             messagebox.showwarning(
                                 "Size Warning", warning_msg)
@@ -864,14 +1343,28 @@ class CodeCombinerApp(customtkinter.CTk):
                             messagebox.showerror("Failed", final_message)
 
                     self.processing_thread = None  # Clear thread reference
+                    # Leave anything after 'done' queued, as a per-message loop would
+                    self.status_queue.requeue(messages[index + 1:])
                     return  # Exit queue processing loop for this cycle
 
-        except queue.Empty:
-            pass  # No messages currently
-
-        # Schedule the next check ONLY if a thread is known to be running
-        if self.processing_thread and self.processing_thread.is_alive():
-            self.after(100, self.process_status_queue)
+            apply_latest()
+        except BaseException:
+            # A failing handler must not drop the rest of the batch (e.g. 'done');
+            # requeue it as the per-message loop would have left it queued
+            unprocessed = messages[index + 1:]
+            if unprocessed:
+                self.status_queue.requeue(unprocessed)
+                self._status_poll_id = self.after(0, self.process_status_queue)
+            raise
+        finally:
+            self._draining_status = False
+
+        if not self.status_queue.empty():
+            # Messages arrived while a popup was open; their event was swallowed
+            self._status_poll_id = self.after(0, self.process_status_queue)
+        # Keep a fallback poll ONLY if a thread is known to be running
+        elif self.processing_thread and self.processing_thread.is_alive():
+            self._status_poll_id = self.after(500, self.process_status_queue)
 
     def start_combination_thread(self):
         # (Method mostly unchanged, validates paths, gets settings, starts thread)
@@ -898,16 +1391,10 @@ class CodeCombinerApp(customtkinter.CTk):
         self.update_status("Starting process...")
 
         # Get include/exclude settings
-        include_str = self.include_entry.get()
-        include_extensions = [ext for ext in (
-            e.strip() for e in include_str.split(',')) if ext]
-        include_extensions = [ext if ext.startswith(
-            '.') or '.' not in ext else '.' + ext for ext in include_extensions]
-
-        exclude_str = self.exclude_textbox.get("1.0", "end-1c")
-        exclude_patterns = [patt for patt in (
-            p.strip() for p in exclude_str.splitlines()) if patt]
+        include_extensions, exclude_patterns = self._parse_filter_entries()
         use_gitignore = self.use_gitignore_var.get()
+        prepared_matcher = self._get_exclude_matcher(
+            in_dir, exclude_patterns, use_gitignore)
 
         self.combine_button.configure(state="disabled")
         self.cancel_button.configure(state="normal")
@@ -916,11 +1403,50 @@ class CodeCombinerApp(customtkinter.CTk):
         self.processing_thread = threading.Thread(
             target=combine_codebase_worker,
             args=(in_dir, out_file, include_extensions, exclude_patterns,
-                  use_gitignore, self.status_queue, self.cancel_event),
+                  use_gitignore, self.status_queue, self.cancel_event,
+                  prepared_matcher),
             daemon=True
         )
         self.processing_thread.start()
-        self.after(100, self.process_status_queue)
+        self.process_status_queue()  # Arms the fallback poll
+
+    def _parse_filter_entries(self):
+        """Returns (include_extensions, exclude_patterns) parsed from the entry
+        widgets, reusing the previous result while their text is unchanged."""
+        include_str = self.include_entry.get()
+        exclude_str = self.exclude_textbox.get("1.0", "end-1c")
+        cached_include_str, cached_exclude_str, include_extensions, exclude_patterns = \
+            self._filter_entries_cache
+        if include_str != cached_include_str:
+            include_extensions = _normalize_include(include_str)
+        if exclude_str != cached_exclude_str:
+            exclude_patterns = [patt for patt in (
+                p.strip() for p in exclude_str.splitlines()) if patt]
+        self._filter_entries_cache = (
+            include_str, exclude_str, include_extensions, exclude_patterns)
+        return include_extensions, exclude_patterns
+
+    def _get_exclude_matcher(self, in_dir, exclude_patterns, use_gitignore):
+        """Returns a cached (matcher, notes) pair, rebuilding it when the root,
+        the exclude settings or the .gitignore modification time change."""
+        root_path = Path(in_dir).resolve()
+        gitignore_mtime = None
+        if use_gitignore:
+            try:
+                gitignore_mtime = (root_path / ".gitignore").stat().st_mtime_ns
+            except OSError:
+                pass
+        key = (str(root_path), use_gitignore, gitignore_mtime,
+               tuple(exclude_patterns))
+        prepared = self._matcher_cache.get(key)
+        if prepared is None:
+            prepared = build_exclude_matcher(
+                root_path, exclude_patterns, use_gitignore)
+            if len(self._matcher_cache) >= 8:
+                # Drop the oldest entry; dicts keep insertion order
+                del self._matcher_cache[next(iter(self._matcher_cache))]
+            self._matcher_cache[key] = prepared
+        return prepared
 
     def cancel_combination(self):
         # (Method unchanged)
@@ -939,9 +1465,9 @@ class CodeCombinerApp(customtkinter.CTk):
                 "File Not Found", "The specified output file does not exist.")
             return
         try:
-            if platform.system() == "Windows":
+            if _SYSTEM == "Windows":
                 os.startfile(filepath)
-            elif platform.system() == "Darwin":
+            elif _SYSTEM == "Darwin":
                 subprocess.call(["open", filepath])
             else:
                 subprocess.call(["xdg-open", filepath])
@@ -966,9 +1492,9 @@ class CodeCombinerApp(customtkinter.CTk):
                 "Folder Not Found", f"The folder containing the output file could not be found:\n{folder_path}")
             return
         try:
-            if platform.system() == "Windows":
+            if _SYSTEM == "Windows":
                 os.startfile(folder_path)
-            elif platform.system() == "Darwin":
+            elif _SYSTEM == "Darwin":
                 subprocess.call(["open", folder_path])
             else:
                 subprocess.call(["xdg-open", folder_path])
@@ -989,10 +1515,31 @@ class CodeCombinerApp(customtkinter.CTk):
 
     def on_closing(self):
         """Called when the window is closed."""
-        print("Saving settings on exit...")
-        self._save_settings()  # Attempt to save settings on exit
-        self.destroy()
+        # Stop a running scan/write; its pool threads are joined at interpreter exit
+        self.cancel_event.set()
+        try:
+            try:
+                settings = self._collect_settings()
+            except ValueError:
+                self._save_settings()  # Reports the invalid threshold
+                return
+            if self._settings_digest(settings) != self._saved_settings_digest:
+                print("Saving settings on exit...")
+                # Serialize here, write in the background so the window closes at once
+                payload = self._serialize_settings(settings)
+                config_file = get_config_path()
 
+                def write_on_exit():
+                    try:
+                        _write_file_atomic(config_file, payload)
+                    except Exception as e:
+                        print(f"Error saving settings on exit: {e}")
+
+                # Not a daemon: interpreter shutdown waits for the write to finish
+                threading.Thread(target=write_on_exit).start()
+        finally:
+            # A failed save must never keep the window from closing
+            self.destroy()
 
 # --- Main Execution ---
 if __name__ == "__main__":